@@ -10,7 +10,8 @@ class DateOperations:
     This class ensures accurate date computations in a business context by accounting for non-working days (weekends and holidays) and provides easy access to adjusted dates in standard and concatenated formats.
     """
 
-    def __init__(self, b_enable_logging : bool,  Region: str, strCurrentDate: str, strPreviousDate: Optional[str] = None):
+    def __init__(self, b_enable_logging : bool,  Region: str, strCurrentDate: str, strPreviousDate: Optional[str] = None,
+                 holiday_calendar_path: str = r'X:\Dept-Market_Risk_LNG\Python Scripts\Pnl Explained\static\holiday_calendar.csv'):
 
         # Create a logger
         self.logger = logging.getLogger(self.__class__.__name__)
@@ -26,7 +27,7 @@ class DateOperations:
         self.logger.info("Initializing DateOperations class")
 
         self.__m_HolidayCalenderList = pd.to_datetime(
-            pd.read_csv(r'X:\Dept-Market_Risk_LNG\Python Scripts\Pnl Explained\static\holiday_calendar.csv').query(f"Region == '{Region}'")['Date'], format='%d/%m/%Y').to_list()
+            pd.read_csv(holiday_calendar_path).query(f"Region == '{Region}'")['Date'], format='%d/%m/%Y').to_list()
 
         strCurrentDate = datetime.strptime(strCurrentDate, '%Y-%m-%d')
         is_weekday = strCurrentDate.weekday() < 5
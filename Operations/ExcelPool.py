@@ -0,0 +1,331 @@
+import os
+import sys
+import time
+import queue
+import signal
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from Misc import ColoredFormatter
+
+
+def _dispatch_excel():
+    """Launch a new, dedicated Excel process. DispatchEx is used so pool members never share an instance."""
+    import win32com.client
+    return win32com.client.DispatchEx("Excel.Application")
+
+
+def _normalise_macro(macro):
+    """
+    Return ``(macro_name, args)`` for a macro name or a ``(macro_name, args)`` tuple. ``args`` is a list or tuple
+    of arguments; any other value (including a string) is passed as the single argument.
+    """
+    if isinstance(macro, str):
+        return macro, ()
+    macro_name, args = macro
+    return macro_name, tuple(args) if isinstance(args, (list, tuple)) else (args,)
+
+
+def _excel_pid(excel):
+    """Return the process id behind an Excel COM object, or None if it cannot be determined."""
+    try:
+        import win32process
+        _, pid = win32process.GetWindowThreadProcessId(excel.Hwnd)
+        return pid
+    except Exception:
+        return None
+
+
+class _ExcelWorker(threading.Thread):
+    """
+    A thread owning one Excel instance. Excel is a single-threaded apartment COM server, so every call
+    against an instance is made from the thread which created it.
+    """
+
+    def __init__(self, pool, worker_id):
+        super().__init__(name=f"ExcelWorker-{worker_id}", daemon=True)
+        self.pool = pool
+        self.worker_id = worker_id
+        self.excel = None
+        self.pid = None
+        self.current_future = None
+        self.hung = False
+        self.runs = 0
+        self.launches = 0
+
+    def _ensure_excel(self):
+        if self.excel is None:
+            self.pool.logger.info(f"{self.name}: launching Excel")
+            self.excel = self.pool.application_factory()
+            self.pid = _excel_pid(self.excel)
+            self.excel.Visible = self.pool.visible
+            self.excel.DisplayAlerts = False
+            self.runs = 0
+            self.launches += 1
+        return self.excel
+
+    def _quit_excel(self):
+        if self.excel is not None:
+            try:
+                self.excel.Quit()
+            except Exception as e:
+                self.pool.logger.error(f"{self.name}: error quitting Excel: {e}")
+            self.excel = None
+            self.pid = None
+
+    def kill(self):
+        """
+        Terminate this worker's Excel process so a hung macro call returns with an error.
+        Called from another thread; a stand-in application may provide a ``Kill()`` method instead of a pid.
+
+        :return: True if a kill was issued, False if there was no way to kill the instance.
+        """
+        excel, pid = self.excel, self.pid
+        self.pool.logger.error(f"{self.name}: killing hung Excel instance (pid {pid})")
+        try:
+            if pid is not None:
+                os.kill(pid, signal.SIGTERM)  # TerminateProcess on Windows
+                return True
+            if excel is not None and hasattr(excel, "Kill"):
+                excel.Kill()
+                return True
+        except Exception as e:
+            self.pool.logger.error(f"{self.name}: error killing Excel: {e}")
+            return False
+        self.pool.logger.error(f"{self.name}: cannot kill Excel, its process id is unknown")
+        return False
+
+    def run(self):
+        com_initialised = False
+        # Any COM object (including one a custom factory dispatches) needs COM initialised on this thread
+        if sys.platform == "win32":
+            import pythoncom
+            pythoncom.CoInitialize()
+            com_initialised = True
+
+        try:
+            while True:
+                job = self.pool._jobs.get()
+                if job is None:
+                    break
+                future, started, filepath, macros, save = job
+                # Publish the future before it starts running, so kill() can always find a running session
+                self.current_future = future
+                running = future.set_running_or_notify_cancel()
+                started.set()
+                if not running:
+                    self.current_future = None
+                    continue
+
+                result = self._run_session(filepath, macros, save)
+                # Set the result before unpublishing, so a caller that cannot find this worker sees the future done
+                future.set_result(result)
+                self.current_future = None
+
+                if self.hung:
+                    # The pool gave up on this session and started a replacement worker; retire quietly
+                    self.pool.logger.info(f"{self.name}: hung session returned, retiring abandoned worker")
+                    break
+
+                if not result["Success"] or self.runs >= self.pool.max_runs_per_instance:
+                    reason = "failure" if not result["Success"] else f"{self.runs} runs"
+                    self.pool.logger.info(f"{self.name}: recycling Excel after {reason}")
+                    self._quit_excel()
+        finally:
+            self._quit_excel()
+            if com_initialised:
+                pythoncom.CoUninitialize()
+
+    def _run_session(self, filepath, macros, save):
+        start = time.perf_counter()
+        results = []
+        workbook = None
+        try:
+            excel = self._ensure_excel()
+            self.pool.logger.info(f"{self.name}: opening workbook {filepath}")
+            workbook = excel.Workbooks.Open(filepath)
+
+            for macro in macros:
+                macro_name, args = macro
+                full_macro_name = f"'{os.path.basename(filepath)}'!{macro_name}"
+                self.pool.logger.info(f"{self.name}: running macro {full_macro_name}")
+                results.append(excel.Application.Run(full_macro_name, *args))
+                self.runs += 1
+
+            if save:
+                workbook.Save()
+            workbook.Close(False)
+            return {"Workbook": filepath, "Success": True, "Results": results, "Error": None,
+                    "Seconds": time.perf_counter() - start, "Worker": self.name}
+
+        except Exception as e:
+            self.pool.logger.error(f"{self.name}: error running macros on '{filepath}': {e}")
+            if workbook is not None:
+                try:
+                    workbook.Close(False)
+                except Exception:
+                    pass
+            return {"Workbook": filepath, "Success": False, "Results": results, "Error": repr(e),
+                    "Seconds": time.perf_counter() - start, "Worker": self.name}
+
+
+class ExcelInstancePool:
+    """
+    ExcelInstancePool keeps a number of warm Excel instances, each owned by its own worker thread, and runs
+    sequences of macros against a workbook in one open-workbook session. An instance is recycled (quit and
+    relaunched on next use) after a given number of macro runs, or after any failure.
+
+    Use as a context manager, or call ``close()`` to quit all instances.
+    """
+
+    def __init__(self, b_enable_logging: bool, size: int = 1, max_runs_per_instance: int = 50,
+                 visible: bool = False, application_factory=None, kill_wait: float = 10.0):
+        """
+        :param size: Number of Excel instances (and worker threads).
+        :param max_runs_per_instance: Macro runs after which an instance is recycled.
+        :param visible: Whether to show Excel windows.
+        :param application_factory: Callable returning an ``Excel.Application``-like object. Defaults to a new
+            Excel process via COM; pass a stand-in to test or benchmark without Excel.
+        :param kill_wait: Seconds ``run`` waits for a killed session to return before giving up on it.
+        """
+        self.size = size
+        self.kill_wait = kill_wait
+        self.max_runs_per_instance = max_runs_per_instance
+        self.visible = visible
+        self.application_factory = application_factory or _dispatch_excel
+        self._jobs = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._next_worker_id = size
+
+        # Create a logger
+        self.logger = logging.getLogger(self.__class__.__name__)
+        if b_enable_logging:
+            self.logger.setLevel(logging.DEBUG)
+            handler = logging.StreamHandler()
+            formatter = ColoredFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            if not self.logger.hasHandlers():
+                self.logger.addHandler(handler)
+        else:
+            self.logger.setLevel(logging.ERROR)
+
+        self.logger.info(f"Initializing ExcelInstancePool with {size} instance(s)")
+
+        self.workers = [_ExcelWorker(self, i) for i in range(size)]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, filepath: str, macros, save: bool = True) -> Future:
+        """
+        Queue a macro session on the next free Excel instance.
+
+        :param filepath: Path to the .xlsm workbook.
+        :param macros: Sequence of macro names, or ``(macro_name, args)`` tuples for macros taking arguments, where
+            ``args`` is a list or tuple of arguments, or a single argument value. A single macro name is run on its own.
+        :param save: Whether to save the workbook after all macros succeed.
+        :return: Future resolving to a dict with Workbook, Success, Results (macro return values), Error,
+            Seconds and Worker.
+        """
+        return self._submit(filepath, macros, save)[0]
+
+    def _submit(self, filepath, macros, save):
+        """Queue a session and return its future and an event set when a worker picks it up."""
+        if self._closed:
+            raise RuntimeError("ExcelInstancePool is closed")
+        if isinstance(macros, str):
+            macros = [macros]
+        future, started = Future(), threading.Event()
+        self._jobs.put((future, started, os.path.abspath(filepath), [_normalise_macro(macro) for macro in macros],
+                        save))
+        return future, started
+
+    def run(self, filepath: str, macros, save: bool = True, timeout: float = None, raise_on_error: bool = False) -> dict:
+        """
+        Run a macro session and wait for its result. See ``submit``.
+
+        :param timeout: Seconds the session may run before it is treated as hung and its Excel process is
+            killed, counted from when a worker starts it (time queued behind other sessions is not counted).
+            The session then returns with Success False and the instance is relaunched on next use.
+            If the instance cannot be killed, or does not return within ``kill_wait`` seconds of the kill, the
+            result is a "hung" failure and that worker is abandoned and replaced by a new one.
+        :param raise_on_error: Raise RuntimeError instead of returning a result with Success False.
+        """
+        future, started = self._submit(filepath, macros, save)
+        started.wait()
+        if future.cancelled():
+            result = self._failed_result(filepath, "Cancelled before it started", 0.0)
+        else:
+            try:
+                result = future.result(timeout)
+            except FutureTimeoutError:
+                killed = self.kill(future)
+                try:
+                    # Even without a kill, the session may have returned since the timeout expired
+                    result = future.result(self.kill_wait if killed else 0)
+                except FutureTimeoutError:
+                    if not self._abandon(future):
+                        # The session returned between the last wait and the abandon
+                        result = future.result()
+                    else:
+                        state = "killed but did not return" if killed else "could not be killed"
+                        result = self._failed_result(filepath, f"Hung after {timeout}s and {state}", timeout)
+
+        if raise_on_error and not result["Success"]:
+            raise RuntimeError(f"Macro session on '{filepath}' failed: {result['Error']}")
+        return result
+
+    @staticmethod
+    def _failed_result(filepath, error, seconds):
+        return {"Workbook": os.path.abspath(filepath), "Success": False, "Results": [], "Error": error,
+                "Seconds": seconds, "Worker": None}
+
+    def _abandon(self, future):
+        """
+        Give up on the worker stuck in ``future``'s session and start a new worker in its place.
+
+        :return: True if a worker was abandoned, False if the session had already returned.
+        """
+        with self._lock:
+            for i, worker in enumerate(self.workers):
+                if worker.current_future is future and not future.done():
+                    worker.hung = True
+                    replacement = _ExcelWorker(self, self._next_worker_id)
+                    self._next_worker_id += 1
+                    self.workers[i] = replacement
+                    self.logger.error(f"{worker.name}: abandoned as hung, replaced by {replacement.name}")
+                    replacement.start()
+                    return True
+        return False
+
+    def kill(self, future: Future) -> bool:
+        """
+        Kill the Excel instance running the session behind ``future``, or cancel it if it has not started.
+
+        :return: True if the session was cancelled or its instance killed, False otherwise.
+        """
+        if future.cancel():
+            return True
+        for worker in self.workers:
+            if worker.current_future is future and not future.done():
+                return worker.kill()
+        return False
+
+    def close(self):
+        """Finish queued sessions, then quit every Excel instance. Workers abandoned as hung are not waited for."""
+        if self._closed:
+            return
+        self._closed = True
+        with self._lock:
+            workers = list(self.workers)
+        for _ in workers:
+            self._jobs.put(None)
+        for worker in workers:
+            worker.join()
+        self.logger.info("ExcelInstancePool closed")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
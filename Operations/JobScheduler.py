@@ -0,0 +1,398 @@
+import os
+import sys
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+import pandas as pd
+from Misc import ColoredFormatter
+
+
+def _com_thread_initializer():
+    """Initialise COM on each "com" worker thread; COM calls fail on threads which have not done so."""
+    if sys.platform == "win32":
+        import pythoncom
+        pythoncom.CoInitialize()
+
+
+def _terminate_process_pool(executor):
+    """
+    Terminate the worker processes of a ProcessPoolExecutor and shut it down without waiting. The executor has no
+    public way to stop a running task, so this reaches into its private ``_processes`` map; it must be called
+    before ``shutdown``, which drops that map.
+    """
+    for process in list((getattr(executor, "_processes", None) or {}).values()):
+        try:
+            process.terminate()
+        except Exception:
+            pass
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _Job:
+    """A step registered with JobScheduler, plus its run state."""
+
+    def __init__(self, name, func, args, kwargs, depends_on, resource, timeout, retries, retry_delay, on_timeout):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.depends_on = list(depends_on)
+        self.resource = resource
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.on_timeout = on_timeout
+
+        self.status = "Pending"
+        self.attempts = 0
+        self.result = None
+        self.error = None
+        self.start = None
+        self.end = None
+        self.not_before = 0.0
+        self.slot_deadline = None
+        self.priority = 0
+
+
+class JobScheduler:
+    """
+    The JobScheduler class runs the steps of a daily pack (macros, workbook reads/writes, mail pulls and sends)
+    as a dependency graph. Steps whose dependencies have succeeded run concurrently, bounded by a limit per
+    resource class:
+
+    - ``"com"``: COM-bound steps (Excel, Outlook), run on threads which have called CoInitialize. COM objects are
+      bound to the thread that created them, so create the ExcelMacroRunner/OutlookManager inside the step rather
+      than passing one built on the main thread. Steps using an ExcelInstancePool are safe either way, since the
+      pool makes its COM calls on its own threads. Keep the limit at the number of Excel instances.
+    - ``"cpu"``: CPU-bound steps (parsing, aggregation), run in a process pool. Functions must be picklable.
+    - ``"io"``: I/O-bound steps (file reads/writes, network), run on threads.
+
+    Each step may have a timeout, a kill-on-hang callback and retries, and ``run`` takes an overall deadline.
+    Python cannot stop a thread, so a thread step which times out keeps running: with an ``on_timeout`` hook
+    (required for ``"com"`` steps) the hook is trusted to end it and its slot is released at once; otherwise the slot
+    is held until the attempt returns, and a retry that cannot get a slot within one timeout fails. A ``"cpu"`` step
+    which times out is stopped by terminating the process pool, which also fails (and, if allowed, retries) any other
+    ``"cpu"`` step running at the time; the same happens when a worker process dies. After ``run`` the timing report
+    marks the critical path, the chain of steps which determined the wall clock.
+    """
+
+    RESOURCES = ("com", "cpu", "io")
+
+    def __init__(self, b_enable_logging: bool, resource_limits: dict = None):
+        """
+        :param resource_limits: Maximum concurrent steps per resource class, e.g. ``{"com": 2, "cpu": 4, "io": 8}``.
+            Defaults to 1 COM step, one CPU step per core and 4 I/O steps.
+        """
+        self.resource_limits = {"com": 1, "cpu": os.cpu_count() or 1, "io": 4}
+        if resource_limits:
+            unknown = set(resource_limits) - set(self.RESOURCES)
+            if unknown:
+                raise ValueError(f"Unknown resource classes: {sorted(unknown)}")
+            self.resource_limits.update(resource_limits)
+
+        self.jobs = {}
+        self.critical_path = []
+        self.wall_seconds = None
+
+        # Create a logger
+        self.logger = logging.getLogger(self.__class__.__name__)
+        if b_enable_logging:
+            self.logger.setLevel(logging.DEBUG)
+            handler = logging.StreamHandler()
+            formatter = ColoredFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            if not self.logger.hasHandlers():
+                self.logger.addHandler(handler)
+        else:
+            self.logger.setLevel(logging.ERROR)
+
+        self.logger.info("Initializing JobScheduler class")
+
+    def add_job(self, name: str, func, args=(), kwargs=None, depends_on=(), resource: str = "io",
+                timeout: float = None, retries: int = 0, retry_delay: float = 0.0, on_timeout=None) -> str:
+        """
+        Register a step.
+
+        :param name: Unique step name.
+        :param func: Callable to run. The step fails if it raises; its return value is available from ``results``.
+        :param args: Positional arguments for ``func``.
+        :param kwargs: Keyword arguments for ``func``.
+        :param depends_on: Names of steps which must succeed before this one starts.
+        :param resource: Resource class - ``"com"``, ``"cpu"`` or ``"io"``.
+        :param timeout: Seconds after which an attempt is treated as hung.
+        :param retries: Number of additional attempts after a failure or timeout.
+        :param retry_delay: Seconds to wait before retrying.
+        :param on_timeout: Callable taking the step name, called when an attempt times out - e.g. to kill a hung
+            Excel instance. Required for ``"com"`` steps with a timeout. If the hook returns without raising, the
+            attempt's resource slot is released at once; without a hook (or if it raises) a thread step keeps its
+            slot until the attempt returns, and a retry which cannot get a slot within one ``timeout`` fails.
+            ``"cpu"`` steps do not need a hook, as their process is terminated. For Excel steps,
+            ``ExcelInstancePool.run`` with ``timeout`` and ``raise_on_error`` kills hung instances itself, so no
+            scheduler timeout is needed.
+        :return: The step name.
+        """
+        if name in self.jobs:
+            raise ValueError(f"Duplicate job name: {name}")
+        if resource not in self.RESOURCES:
+            raise ValueError(f"Unknown resource class '{resource}', expected one of {self.RESOURCES}")
+        if resource == "com" and timeout is not None and on_timeout is None:
+            raise ValueError(f"Job '{name}': a 'com' step with a timeout needs an on_timeout hook to kill the hung "
+                             f"COM server, or use ExcelInstancePool.run(timeout=...) inside the step instead")
+        self.jobs[name] = _Job(name, func, tuple(args), dict(kwargs or {}), depends_on, resource, timeout, retries,
+                               retry_delay, on_timeout)
+        return name
+
+    def _validate_and_prioritise(self):
+        """Check dependencies exist and form no cycle; rank steps by the longest chain of steps they unblock."""
+        for job in self.jobs.values():
+            for dependency in job.depends_on:
+                if dependency not in self.jobs:
+                    raise ValueError(f"Job '{job.name}' depends on unknown job '{dependency}'")
+
+        dependants = {name: [] for name in self.jobs}
+        for job in self.jobs.values():
+            for dependency in job.depends_on:
+                dependants[dependency].append(job.name)
+
+        visiting, depth = set(), {}
+
+        def chain_length(name):
+            if name in depth:
+                return depth[name]
+            if name in visiting:
+                raise ValueError(f"Dependency cycle involving job '{name}'")
+            visiting.add(name)
+            depth[name] = 1 + max((chain_length(child) for child in dependants[name]), default=0)
+            visiting.discard(name)
+            return depth[name]
+
+        for name, job in self.jobs.items():
+            job.priority = chain_length(name)
+
+    def run(self, deadline: float = None) -> pd.DataFrame:
+        """
+        Run every registered step.
+
+        :param deadline: Seconds after which the run stops: running attempts get their ``on_timeout`` hook and
+            every unfinished step is marked TimedOut.
+
+        :return: DataFrame timing report with one row per step: Job, Resource, Status (Succeeded, Failed, TimedOut
+            or Skipped), Attempts, Start and End (seconds from the start of the run), Seconds, Error and
+            CriticalPath. The critical path is also kept in ``critical_path`` and the wall clock in ``wall_seconds``.
+        """
+        self._validate_and_prioritise()
+        for job in self.jobs.values():
+            job.status, job.attempts, job.result, job.error, job.start, job.end = "Pending", 0, None, None, None, None
+            job.not_before, job.slot_deadline = 0.0, None
+
+        # Thread pools may grow past the limit (threads start lazily), so an attempt abandoned after a timeout does
+        # not block the next one; ``busy`` enforces the limit
+        thread_counts = {resource: max(sum(job.resource == resource for job in self.jobs.values()), 1)
+                         for resource in ("com", "io")}
+        executors = {
+            "com": ThreadPoolExecutor(thread_counts["com"], thread_name_prefix="com",
+                                      initializer=_com_thread_initializer),
+            "io": ThreadPoolExecutor(thread_counts["io"], thread_name_prefix="io"),
+        }
+        if any(job.resource == "cpu" for job in self.jobs.values()):
+            executors["cpu"] = ProcessPoolExecutor(self.resource_limits["cpu"])
+
+        run_start = time.perf_counter()
+        running = {}  # future -> (job, attempt start, timed out, slot released)
+        busy = {resource: 0 for resource in self.RESOURCES}
+
+        def now():
+            return time.perf_counter() - run_start
+
+        def finish_attempt(job, status, error, slot_held=False):
+            job.error = error
+            if status != "Succeeded" and job.attempts <= job.retries:
+                self.logger.error(f"Job '{job.name}' attempt {job.attempts} failed: {error}; retrying")
+                job.status = "Pending"
+                job.not_before = now() + job.retry_delay
+                if slot_held:
+                    job.slot_deadline = job.not_before + job.timeout
+                return
+            job.status = status
+            job.end = now()
+            if status == "Succeeded":
+                self.logger.info(f"Job '{job.name}' succeeded in {job.end - job.start:.2f}s")
+            else:
+                self.logger.error(f"Job '{job.name}' failed ({status}): {error}")
+
+        def release(job):
+            busy[job.resource] -= 1
+
+        def restart_cpu_pool(reason):
+            # Stop every process in the pool and start a fresh one. Attempts still running in the old pool are lost:
+            # they release their slots and fail (so retry and skip rules apply), unless already reported as timed out
+            self.logger.error(f"Restarting the cpu process pool: {reason}")
+            _terminate_process_pool(executors["cpu"])
+            executors["cpu"] = ProcessPoolExecutor(self.resource_limits["cpu"])
+            for future, (job, attempt_start, timed_out, released) in list(running.items()):
+                if job.resource != "cpu":
+                    continue
+                del running[future]
+                if not released:
+                    release(job)
+                if not timed_out:
+                    finish_attempt(job, "Failed", f"Process pool restarted: {reason}")
+
+        try:
+            while True:
+                if deadline is not None and now() >= deadline:
+                    for future, (job, attempt_start, timed_out, released) in running.items():
+                        if not timed_out and job.on_timeout is not None:
+                            try:
+                                job.on_timeout(job.name)
+                            except Exception as e:
+                                self.logger.error(f"Job '{job.name}' on_timeout callback failed: {e}")
+                    for job in self.jobs.values():
+                        if job.status in ("Pending", "Running"):
+                            job.status, job.error, job.end = "TimedOut", f"Run deadline of {deadline}s exceeded", now()
+                            self.logger.error(f"Job '{job.name}' failed (TimedOut): run deadline exceeded")
+                    break
+
+                # Skip steps whose dependencies can no longer succeed
+                for job in self.jobs.values():
+                    if job.status == "Pending" and any(
+                            self.jobs[d].status in ("Failed", "TimedOut", "Skipped") for d in job.depends_on):
+                        job.status, job.error = "Skipped", "Dependency did not succeed"
+                        self.logger.error(f"Job '{job.name}' skipped: a dependency did not succeed")
+                    elif job.status == "Pending" and job.slot_deadline is not None and now() >= job.slot_deadline:
+                        job.status, job.end = "TimedOut", now()
+                        job.error = f"Retry could not get a '{job.resource}' slot; a timed-out attempt still holds it"
+                        self.logger.error(f"Job '{job.name}' failed (TimedOut): {job.error}")
+
+                # Start ready steps, longest downstream chain first
+                ready = sorted((job for job in self.jobs.values() if job.status == "Pending"
+                                and job.not_before <= now()
+                                and all(self.jobs[d].status == "Succeeded" for d in job.depends_on)),
+                               key=lambda job: -job.priority)
+                for job in ready:
+                    if busy[job.resource] >= self.resource_limits[job.resource]:
+                        continue
+                    job.attempts += 1
+                    job.status = "Running"
+                    job.slot_deadline = None
+                    if job.start is None:
+                        job.start = now()
+                    self.logger.info(f"Starting job '{job.name}' ({job.resource}, attempt {job.attempts})")
+                    try:
+                        future = executors[job.resource].submit(job.func, *job.args, **job.kwargs)
+                    except BrokenProcessPool as e:
+                        restart_cpu_pool("a worker process died")
+                        finish_attempt(job, "Failed", repr(e))
+                        continue
+                    running[future] = (job, time.perf_counter(), False, False)
+                    busy[job.resource] += 1
+
+                # Finished once every step is settled; attempts abandoned after a timeout are not waited for
+                if not any(job.status in ("Pending", "Running") for job in self.jobs.values()):
+                    break
+
+                # Sleep until a step finishes, a timeout expires or a retry becomes due
+                wake = [0.5]
+                if deadline is not None:
+                    wake.append(deadline - now())
+                for job, attempt_start, timed_out, released in running.values():
+                    if job.timeout is not None and not timed_out:
+                        wake.append(attempt_start + job.timeout - time.perf_counter())
+                for job in self.jobs.values():
+                    if job.status == "Pending" and job.not_before > now():
+                        wake.append(job.not_before - now())
+                    if job.status == "Pending" and job.slot_deadline is not None:
+                        wake.append(job.slot_deadline - now())
+                if running:
+                    done, _ = wait(list(running), timeout=max(min(wake), 0.0), return_when=FIRST_COMPLETED)
+                else:
+                    time.sleep(max(min(wake), 0.0))
+                    done = set()
+
+                cpu_pool_broken = False
+                for future in done:
+                    job, attempt_start, timed_out, released = running.pop(future)
+                    if not released:
+                        release(job)
+                    if timed_out:
+                        continue  # the attempt was already reported; it has now released its slot
+                    try:
+                        job.result = future.result()
+                        finish_attempt(job, "Succeeded", None)
+                    except BrokenProcessPool as e:
+                        cpu_pool_broken = True
+                        finish_attempt(job, "Failed", repr(e))
+                    except Exception as e:
+                        finish_attempt(job, "Failed", repr(e))
+                if cpu_pool_broken:
+                    restart_cpu_pool("a worker process died")
+
+                cpu_timed_out = []
+                for future, (job, attempt_start, timed_out, released) in list(running.items()):
+                    if timed_out or job.timeout is None or time.perf_counter() - attempt_start < job.timeout:
+                        continue
+                    killed = False
+                    if job.on_timeout is not None:
+                        try:
+                            job.on_timeout(job.name)
+                            killed = True
+                        except Exception as e:
+                            self.logger.error(f"Job '{job.name}' on_timeout callback failed: {e}")
+                    if killed:
+                        release(job)
+                    running[future] = (job, attempt_start, True, killed)
+                    if job.resource == "cpu":
+                        cpu_timed_out.append(job.name)  # its slot is released when the pool is restarted below
+                    finish_attempt(job, "TimedOut", f"Timed out after {job.timeout}s",
+                                   slot_held=not killed and job.resource != "cpu")
+                if cpu_timed_out:
+                    restart_cpu_pool(f"stopping timed-out job(s) {', '.join(cpu_timed_out)}")
+        finally:
+            for resource, executor in executors.items():
+                if resource == "cpu" and any(job.resource == "cpu" for job, *_ in running.values()):
+                    # Otherwise the interpreter waits at exit for cpu attempts left running by a deadline or error
+                    _terminate_process_pool(executor)
+                else:
+                    executor.shutdown(wait=False, cancel_futures=True)
+
+        self.wall_seconds = now()
+        self.critical_path = self._critical_path()
+        report = self.report()
+        self.logger.info(f"Run finished in {self.wall_seconds:.2f}s (sum of steps {report['Seconds'].sum():.2f}s); "
+                         f"critical path: {' -> '.join(self.critical_path)}")
+        return report
+
+    def _critical_path(self):
+        """Walk back from the last step to finish, each time through the dependency which finished last."""
+        finished = [job for job in self.jobs.values() if job.end is not None]
+        if not finished:
+            return []
+        job = max(finished, key=lambda j: j.end)
+        path = [job.name]
+        while True:
+            dependencies = [self.jobs[d] for d in job.depends_on if self.jobs[d].end is not None]
+            if not dependencies:
+                break
+            job = max(dependencies, key=lambda j: j.end)
+            path.append(job.name)
+        return path[::-1]
+
+    def report(self) -> pd.DataFrame:
+        """Timing report of the last run. See ``run``."""
+        on_path = set(self.critical_path)
+        return pd.DataFrame([{
+            "Job": job.name,
+            "Resource": job.resource,
+            "Status": job.status,
+            "Attempts": job.attempts,
+            "Start": job.start,
+            "End": job.end,
+            "Seconds": (job.end - job.start) if job.end is not None and job.start is not None else 0.0,
+            "Error": job.error,
+            "CriticalPath": job.name in on_path,
+        } for job in self.jobs.values()])
+
+    def results(self) -> dict:
+        """Return values of the steps which succeeded in the last run, keyed by step name."""
+        return {name: job.result for name, job in self.jobs.items() if job.status == "Succeeded"}
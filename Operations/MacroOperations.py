@@ -1,6 +1,6 @@
 import os
 import logging
-import win32com.client
+from ExcelPool import ExcelInstancePool
 
 
 class ExcelMacroRunner:
@@ -9,15 +9,18 @@ class ExcelMacroRunner:
     using the Windows COM interface (via win32com.client).
     """
 
-    def __init__(self, filepath: str, enable_logging: bool = True):
+    def __init__(self, filepath: str, enable_logging: bool = True, application_factory=None):
         """
         Initialize the macro runner.
 
         :param filepath: Path to the .xlsm Excel file.
         :param enable_logging: Enable or disable logging.
+        :param application_factory: Callable returning an Excel.Application-like object. If None, Excel is
+            started via COM; pass a stand-in to test or benchmark without Excel.
         """
         self.filepath = os.path.abspath(filepath)
         self.enable_logging = enable_logging
+        self.application_factory = application_factory
         self.logger = logging.getLogger(self.__class__.__name__)
 
         if enable_logging:
@@ -44,7 +47,11 @@ class ExcelMacroRunner:
         """
         try:
             self.logger.info("Launching Excel via COM interface...")
-            excel = win32com.client.Dispatch("Excel.Application")
+            if self.application_factory is None:
+                import win32com.client
+                excel = win32com.client.Dispatch("Excel.Application")
+            else:
+                excel = self.application_factory()
             excel.Visible = visible
 
             self.logger.info(f"Opening workbook: {self.filepath}")
@@ -66,3 +73,24 @@ class ExcelMacroRunner:
         except Exception as e:
             self.logger.error(f"Error running macro '{macro_name}': {e}")
             return False
+
+    def run_macros(self, macros, visible: bool = False, save: bool = True, pool: ExcelInstancePool = None,
+                   timeout: float = None) -> dict:
+        """
+        Run a sequence of macros from the Excel workbook in a single open-workbook session.
+
+        :param macros: Sequence of macro names, or (macro_name, args) tuples for macros taking arguments;
+            args is a list or tuple of arguments, or a single argument value. A single macro name is run on its own.
+        :param visible: Whether to show Excel while running the macros (ignored when a pool is given).
+        :param save: Whether to save the workbook after all macros succeed.
+        :param pool: An ExcelInstancePool to reuse warm Excel instances. If None, a single instance is
+            launched for this call and quit afterwards.
+        :param timeout: Seconds after which the session is treated as hung and its Excel process is killed.
+        :return: dict with Success, Results (macro return values), Error and Seconds.
+        """
+        if pool is not None:
+            return pool.run(self.filepath, macros, save, timeout)
+
+        with ExcelInstancePool(self.enable_logging, size=1, visible=visible,
+                               application_factory=self.application_factory) as temporary_pool:
+            return temporary_pool.run(self.filepath, macros, save, timeout)
@@ -0,0 +1,332 @@
+import os
+import time
+import queue
+import shutil
+import logging
+import tempfile
+import threading
+import mimetypes
+from io import BytesIO
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+import pandas as pd
+from Misc import ColoredFormatter
+
+
+class _LocalAttachments:
+    """Mimics the Outlook ``MailItem.Attachments`` collection for LocalOutbox items."""
+
+    def __init__(self):
+        self.paths = []
+
+    @property
+    def Count(self):
+        return len(self.paths)
+
+    def Add(self, path):
+        self.paths.append(path)
+
+
+class _LocalMailItem:
+    """Mimics the subset of an Outlook ``MailItem`` used by MailDispatcher."""
+
+    def __init__(self, outbox):
+        self._outbox = outbox
+        self.To = ""
+        self.CC = ""
+        self.BCC = ""
+        self.Subject = ""
+        self.Body = ""
+        self.HTMLBody = ""
+        self.Attachments = _LocalAttachments()
+
+    def Send(self):
+        self._outbox._write(self)
+
+    def Display(self, modal=False):
+        self._outbox._write(self)
+
+
+class LocalOutbox:
+    """
+    LocalOutbox is a stand-in for the ``Outlook.Application`` COM object which writes every sent
+    message to an ``.eml`` file instead of handing it to Outlook. It lets bulk dispatch be tested
+    and benchmarked on machines without Outlook.
+    """
+
+    def __init__(self, outbox_dir):
+        """
+        :param outbox_dir: Directory the ``.eml`` files are written to (created if missing).
+        """
+        self.outbox_dir = os.path.abspath(outbox_dir)
+        os.makedirs(self.outbox_dir, exist_ok=True)
+        self.sent_count = 0
+        self._lock = threading.Lock()
+
+    def GetNamespace(self, name):
+        # LocalOutbox only sends; there is no mailbox to read from
+        return None
+
+    def CreateItem(self, item_type):
+        if item_type != 0:
+            raise ValueError(f"LocalOutbox only supports MailItem (0), got {item_type}")
+        return _LocalMailItem(self)
+
+    def _write(self, mail):
+        message = EmailMessage()
+        message["To"] = mail.To
+        if mail.CC:
+            message["Cc"] = mail.CC
+        if mail.BCC:
+            message["Bcc"] = mail.BCC
+        message["Subject"] = mail.Subject
+        message["Date"] = formatdate(localtime=True)
+        message["Message-ID"] = make_msgid()
+        if mail.HTMLBody:
+            message.set_content(mail.Body or "")
+            message.add_alternative(mail.HTMLBody, subtype="html")
+        else:
+            message.set_content(mail.Body or "")
+
+        for path in mail.Attachments.paths:
+            mime_type, _ = mimetypes.guess_type(path)
+            maintype, subtype = (mime_type or "application/octet-stream").split("/", 1)
+            with open(path, "rb") as f:
+                message.add_attachment(f.read(), maintype=maintype, subtype=subtype,
+                                       filename=os.path.basename(path))
+
+        with self._lock:
+            self.sent_count += 1
+            filename = os.path.join(self.outbox_dir, f"{self.sent_count:06d}.eml")
+        with open(filename, "wb") as f:
+            f.write(bytes(message))
+
+
+class MailDispatcher:
+    """
+    The MailDispatcher class sends a personalised message per row of a recipients DataFrame
+    (mail-merge) through a single long-lived Outlook session.
+
+    Messages are rendered on a background thread into a bounded work queue and sent from the calling
+    thread, which owns the Outlook COM object. In-memory attachments (bytes or DataFrames) are written
+    to disk once per dispatch rather than once per message.
+    """
+
+    # Errors caused by the message itself (missing attachment file, bad field value); retrying cannot fix them
+    PERMANENT_ERRORS = (FileNotFoundError, TypeError, ValueError)
+
+    def __init__(self, b_enable_logging: bool, outlook, max_retries: int = 2, retry_delay: float = 1.0,
+                 queue_size: int = 50):
+        """
+        :param outlook: ``Outlook.Application`` COM object, or a LocalOutbox stand-in.
+        :param max_retries: Number of additional attempts for a message whose send fails. Errors in
+            ``PERMANENT_ERRORS`` are not retried.
+        :param retry_delay: Seconds to wait before the first retry; doubled on each further retry.
+        :param queue_size: Maximum number of rendered messages held in memory ahead of sending.
+        """
+        self.outlook = outlook
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.queue_size = queue_size
+
+        # Create a logger
+        self.logger = logging.getLogger(self.__class__.__name__)
+        if b_enable_logging:
+            self.logger.setLevel(logging.DEBUG)
+            handler = logging.StreamHandler()
+            formatter = ColoredFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            if not self.logger.hasHandlers():
+                self.logger.addHandler(handler)
+        else:
+            self.logger.setLevel(logging.ERROR)
+
+        self.logger.info("Initializing MailDispatcher class")
+
+    @staticmethod
+    def _materialise_attachment(name, content, directory):
+        """
+        Write an attachment to ``directory`` under ``name`` and return its path.
+
+        :param name: File name the recipient sees (extension picks the DataFrame format). Must not contain a path.
+        :param content: A path (str) to copy, raw bytes, a BytesIO or a DataFrame.
+        """
+        if name in ("", ".", "..") or os.path.basename(name) != name or any(sep in name for sep in ("/", "\\")):
+            raise ValueError(f"Attachment name must be a plain file name, got '{name}'")
+
+        path = os.path.join(directory, name)
+        if isinstance(content, str):
+            shutil.copyfile(content, path)
+        elif isinstance(content, pd.DataFrame):
+            if name.lower().endswith(".xlsx"):
+                content.to_excel(path, index=False, engine="openpyxl")
+            else:
+                content.to_csv(path, index=False)
+        elif isinstance(content, BytesIO):
+            with open(path, "wb") as f:
+                f.write(content.getvalue())
+        elif isinstance(content, (bytes, bytearray)):
+            with open(path, "wb") as f:
+                f.write(content)
+        else:
+            raise TypeError(f"Unsupported attachment type for '{name}': {type(content).__name__}")
+        return path
+
+    def _materialise_attachments(self, attachments, directory):
+        """
+        Normalise an attachment spec to a list of paths.
+
+        :param attachments: None, a list of paths, or a dict mapping file name to content.
+        """
+        if attachments is None or (not isinstance(attachments, (list, tuple, dict)) and pd.isna(attachments)):
+            return []
+        if isinstance(attachments, str):
+            return [attachments]
+        if isinstance(attachments, dict):
+            os.makedirs(directory, exist_ok=True)
+            return [self._materialise_attachment(name, content, directory) for name, content in attachments.items()]
+        paths = list(attachments)
+        for path in paths:
+            if not isinstance(path, str):
+                raise TypeError("In-memory attachments must be passed as a dict of file name to content")
+        return paths
+
+    def _render(self, position, fields, subject_template, body_template, to_column, cc_column, bcc_column,
+                attachment_column, shared_paths, temp_dir):
+        """
+        Build the message dict for one recipient row, or raise if the row cannot be rendered.
+        Per-row attachments go in a directory named after the row's position, which is always unique and path-safe.
+        """
+        to = fields[to_column]
+        if to is None or (isinstance(to, float) and pd.isna(to)) or not str(to).strip():
+            raise ValueError(f"No recipient in column '{to_column}'")
+
+        row_paths = []
+        if attachment_column is not None:
+            row_dir = os.path.join(temp_dir, f"row_{position}")
+            row_paths = self._materialise_attachments(fields.get(attachment_column), row_dir)
+
+        return {
+            "To": to,
+            "CC": fields.get(cc_column) if cc_column else None,
+            "BCC": fields.get(bcc_column) if bcc_column else None,
+            "Subject": subject_template.format_map(fields),
+            "Body": body_template.format_map(fields),
+            "Attachments": shared_paths + row_paths,
+        }
+
+    def _send_one(self, message, html):
+        mail = self.outlook.CreateItem(0)  # 0 represents a MailItem
+        mail.To = message["To"]
+        mail.Subject = message["Subject"]
+        if html:
+            mail.HTMLBody = message["Body"]
+        else:
+            mail.Body = message["Body"]
+
+        if message["CC"] and not pd.isna(message["CC"]):
+            mail.CC = message["CC"]
+        if message["BCC"] and not pd.isna(message["BCC"]):
+            mail.BCC = message["BCC"]
+        for attachment in message["Attachments"]:
+            mail.Attachments.Add(attachment)
+
+        mail.Send()
+
+    def send_bulk(self, recipients_df, subject_template, body_template, html=False, to_column="To",
+                  cc_column=None, bcc_column=None, attachments=None, attachment_column=None):
+        """
+        Send one personalised email per row of ``recipients_df``.
+
+        Templates use ``str.format`` fields named after the DataFrame columns, e.g. ``"Risk report for {Desk}"``.
+        A row that fails to render or send is recorded in the report; it does not stop the batch.
+
+        :param recipients_df: DataFrame with one row per message.
+        :param subject_template: Subject template.
+        :param body_template: Plain text or HTML body template.
+        :param html: Whether ``body_template`` is HTML.
+        :param to_column: Column holding the recipient address(es).
+        :param cc_column: Column holding CC addresses (optional).
+        :param bcc_column: Column holding BCC addresses (optional).
+        :param attachments: Attachments sent with every message - a list of paths, or a dict mapping
+            file name to content (a path, which is copied under that name, bytes, BytesIO or DataFrame).
+        :param attachment_column: Column holding per-row attachments in the same forms (optional).
+        :return: DataFrame report with one row per message: Row (index label), To, Status, Attempts, Error, Seconds.
+        """
+        if not recipients_df.index.is_unique:
+            raise ValueError("recipients_df index must be unique so report rows map to one message; "
+                             "call reset_index(drop=True) first")
+
+        self.logger.info(f"Dispatching {len(recipients_df)} emails")
+        temp_dir = tempfile.mkdtemp(prefix="mail_dispatch_")
+        work_queue = queue.Queue(maxsize=self.queue_size)
+        done = object()
+        stop_event = threading.Event()
+        report = []
+
+        def put(item):
+            # Give up if the sending side has stopped, so this thread never blocks on a full queue.
+            while not stop_event.is_set():
+                try:
+                    work_queue.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def producer(shared_paths):
+            for position, (row_id, row) in enumerate(recipients_df.iterrows()):
+                if stop_event.is_set():
+                    break
+                fields = row.to_dict()
+                try:
+                    message = self._render(position, fields, subject_template, body_template, to_column, cc_column,
+                                           bcc_column, attachment_column, shared_paths, temp_dir)
+                    put((row_id, message, None))
+                except Exception as e:
+                    put((row_id, {"To": fields.get(to_column)}, e))
+            put(done)
+
+        try:
+            shared_paths = self._materialise_attachments(attachments, os.path.join(temp_dir, "shared"))
+            render_thread = threading.Thread(target=producer, args=(shared_paths,), daemon=True)
+            render_thread.start()
+
+            while True:
+                item = work_queue.get()
+                if item is done:
+                    break
+                row_id, message, render_error = item
+                start = time.perf_counter()
+
+                if render_error is not None:
+                    self.logger.error(f"Error rendering email for row {row_id}: {render_error!r}")
+                    report.append({"Row": row_id, "To": message["To"], "Status": "Failed", "Attempts": 0,
+                                   "Error": repr(render_error), "Seconds": 0.0})
+                    continue
+
+                attempts, error = 0, None
+                while attempts <= self.max_retries:
+                    attempts += 1
+                    try:
+                        self._send_one(message, html)
+                        error = None
+                        break
+                    except Exception as e:
+                        error = e
+                        self.logger.error(f"Error sending email to {message['To']} (attempt {attempts}): {e}")
+                        if isinstance(e, self.PERMANENT_ERRORS):
+                            break
+                        if attempts <= self.max_retries:
+                            time.sleep(self.retry_delay * 2 ** (attempts - 1))
+
+                report.append({"Row": row_id, "To": message["To"], "Status": "Sent" if error is None else "Failed",
+                               "Attempts": attempts, "Error": None if error is None else repr(error),
+                               "Seconds": time.perf_counter() - start})
+        finally:
+            stop_event.set()
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        report_df = pd.DataFrame(report, columns=["Row", "To", "Status", "Attempts", "Error", "Seconds"])
+        sent = int((report_df["Status"] == "Sent").sum())
+        self.logger.info(f"Dispatch complete: {sent} sent, {len(report_df) - sent} failed")
+        return report_df
@@ -1,14 +1,18 @@
-import win32com.client
 import logging
 from io import BytesIO
 import pandas as pd
 from Misc import ColoredFormatter
+from MailDispatch import MailDispatcher
 
 class OutlookManager:
     """
     The OutlookManager class provides an interface for automating various tasks within Microsoft Outlook, such as sending emails, managing tasks, listing emails, and creating calendar events.
     """
-    def __init__(self, b_enable_logging):
+    def __init__(self, b_enable_logging, outlook=None):
+        """
+        :param outlook: An existing Outlook.Application object, or a stand-in exposing the same interface.
+            If None, Outlook is started via COM.
+        """
 
         # Create a logger
         self.logger = logging.getLogger(self.__class__.__name__)
@@ -24,7 +28,10 @@ class OutlookManager:
         self.logger.info("Initializing OutlookManager class")
 
         try:
-            self.outlook = win32com.client.Dispatch("Outlook.Application")
+            if outlook is None:
+                import win32com.client
+                outlook = win32com.client.Dispatch("Outlook.Application")
+            self.outlook = outlook
             self.namespace = self.outlook.GetNamespace("MAPI")
         except Exception as e:
             print(f"Error initializing Outlook: {e}")
@@ -80,6 +87,27 @@ class OutlookManager:
         HTLMEmailSent = True
         return HTLMEmailSent
 
+    def send_bulk_emails(self, recipients_df, subject_template, body_template, html=False, to_column="To",
+                         cc_column=None, bcc_column=None, attachments=None, attachment_column=None,
+                         max_retries=2, retry_delay=1.0, queue_size=50):
+        """
+        Mail-merge: send one personalised email per row of a DataFrame through this Outlook session.
+        See MailDispatcher.send_bulk for the template and attachment formats.
+
+        :param recipients_df: DataFrame with one row per message.
+        :param subject_template: Subject template, e.g. "Risk report for {Desk}".
+        :param body_template: Body template filled from the row's columns.
+        :param html: Whether body_template is HTML.
+        :param attachments: Attachments for every message - list of paths or dict of file name to path/bytes/DataFrame.
+        :param attachment_column: Column holding per-row attachments (optional).
+        :return: DataFrame report with the status of each message.
+        """
+        dispatcher = MailDispatcher(self.logger.isEnabledFor(logging.DEBUG), self.outlook, max_retries=max_retries,
+                                    retry_delay=retry_delay, queue_size=queue_size)
+        return dispatcher.send_bulk(recipients_df, subject_template, body_template, html=html, to_column=to_column,
+                                    cc_column=cc_column, bcc_column=bcc_column, attachments=attachments,
+                                    attachment_column=attachment_column)
+
     def create_task(self, subject, due_date, body=None):
 
         TasksCreated = False
@@ -0,0 +1,509 @@
+"""
+Benchmarks for the Operations modules, runnable offline on Linux.
+
+Inputs are generated from a fixed seed (see synthetic.py); Outlook and Excel are replaced by in-process stand-ins.
+Each case is timed over several repeats at each data size (the best repeat is kept), then run once more under
+tracemalloc for peak Python memory. Results are written as JSON and can be compared against a saved baseline.
+
+Usage:
+    python benchmarks/run_benchmarks.py                              # all cases, small and medium sizes
+    python benchmarks/run_benchmarks.py --sizes small medium large --filter excel
+    python benchmarks/run_benchmarks.py --save-baseline              # write benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json --threshold 0.2
+
+Only cases run with the same seed and parameters as the baseline are compared; the others, and cases missing on
+either side, are listed separately. The exit code is 1 if any compared case is slower, or peaks higher in memory,
+than the baseline by more than the relative threshold and the absolute minimum delta (--min-delta seconds,
+--min-memory-delta MB). The absolute floor keeps millisecond-scale cases from flagging on timer noise. The default 50% time threshold suits shared machines, where
+best-of-N timings of identical code still vary by up to about 45%; tighten it on a quiet, dedicated machine.
+"""
+import gc
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import importlib.util
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARK_DIR), "Operations"))
+
+import synthetic  # noqa: E402
+from DateOperations import DateOperations  # noqa: E402
+from FileOperations import ExcelFileHandler  # noqa: E402
+from Misc import weighted_avg, get_highlight_style, read_named_range_to_df  # noqa: E402
+from OutlookManager import OutlookManager  # noqa: E402
+from MailDispatch import LocalOutbox  # noqa: E402
+from MacroOperations import ExcelMacroRunner  # noqa: E402
+from ExcelPool import ExcelInstancePool  # noqa: E402
+from JobScheduler import JobScheduler  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+DEFAULT_RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+SIZES = ("small", "medium", "large")
+MIN_TIMED_SECONDS = 1.0  # fast cases are repeated until their timed runs add up to this, as they are noisy
+MAX_REPEAT = 15
+
+
+class Case:
+    """
+    A benchmark case. ``setup(params, workdir, rng)`` builds the inputs outside the timed region and returns a
+    state object; ``run(state)`` is the timed call. ``items(params)`` is the unit count used for throughput.
+    """
+
+    def __init__(self, name, sizes, setup, run, items, unit, requires=()):
+        self.name = name
+        self.sizes = sizes
+        self.setup = setup
+        self.run = run
+        self.items = items
+        self.unit = unit
+        self.requires = requires
+
+
+# --- DateOperations ----------------------------------------------------------------------------------------------
+
+CURRENT_DATE = datetime(2026, 3, 10)  # a Tuesday, kept clear of generated holidays
+
+
+def _setup_dates(params, workdir, rng):
+    path = os.path.join(workdir, "holiday_calendar.csv")
+    synthetic.holiday_calendar_csv(path, rng, params["years"], holidays_per_year=params["holidays"],
+                                   keep_clear=[CURRENT_DATE, CURRENT_DATE - pd.Timedelta(days=1)])
+    return path
+
+
+def _run_dates(path):
+    dates = DateOperations(False, "UK", CURRENT_DATE.strftime("%Y-%m-%d"), holiday_calendar_path=path)
+    dates.m_LastBusinessDayPrevMonth()
+    dates.m_LastBusinessDayPrevYear()
+
+
+# --- ExcelFileHandler --------------------------------------------------------------------------------------------
+
+def _setup_workbook(params, workdir, rng):
+    path = os.path.join(workdir, "book.xlsx")
+    frames = synthetic.multi_sheet_workbook(path, rng, params["sheets"], params["rows"], params["cols"])
+    return {"path": path, "frames": frames, "rng": rng, "params": params}
+
+
+def _run_write_data(state):
+    ExcelFileHandler(False, state["path"]).write_data(state["frames"], False)
+
+
+def _run_read_excel(state):
+    ExcelFileHandler(False, state["path"]).read_excel()
+
+
+def _run_read_sheets(state):
+    handler = ExcelFileHandler(False, state["path"])
+    for sheetname in state["frames"]:
+        handler.read_sheet(sheetname)
+
+
+def _run_amend_records(state):
+    new_rows = synthetic.risk_frame(state["rng"], max(state["params"]["rows"] // 10, 1), state["params"]["cols"])
+    ExcelFileHandler(False, state["path"]).amend_records("Sheet0", 0, new_rows)
+
+
+def _run_write_with_formatting(state):
+    sheets_data, formats = [], []
+    fmt = {"format": "fmt", "type": "no_blanks", "colHeaders": True, "colsToHighlight": True, "createHeatMap": True}
+    for sheetname, frame in state["frames"].items():
+        sheets_data.append((sheetname, frame, 0, 0))
+        formats.append((sheetname, 0, 0, len(frame), frame.shape[1], fmt, [2, 3]))
+    ExcelFileHandler(False, state["path"]).write_with_formatting(sheets_data, formats)
+
+
+def _workbook_cells(params):
+    return params["sheets"] * params["rows"] * (params["cols"] + 2)
+
+
+WORKBOOK_SIZES = {
+    "small": {"sheets": 3, "rows": 500, "cols": 10},
+    "medium": {"sheets": 4, "rows": 2_000, "cols": 15},
+    "large": {"sheets": 6, "rows": 10_000, "cols": 40},
+}
+WIDE_WORKBOOK_SIZES = {
+    "small": {"sheets": 2, "rows": 50, "cols": 200},
+    "medium": {"sheets": 4, "rows": 100, "cols": 300},
+    "large": {"sheets": 4, "rows": 500, "cols": 1_000},
+}
+
+
+# --- Misc --------------------------------------------------------------------------------------------------------
+
+def _setup_named_range(params, workdir, rng):
+    path = os.path.join(workdir, "named_range.xlsx")
+    return path, synthetic.named_range_workbook(path, rng, params["rows"], params["cols"])
+
+
+def _run_named_range(state):
+    read_named_range_to_df(*state)
+
+
+def _setup_frame(params, workdir, rng):
+    frame = synthetic.risk_frame(rng, params["rows"], 2)
+    frame["Weight"] = rng.uniform(0, 1, size=params["rows"])
+    return frame
+
+
+def _run_weighted_avg(frame):
+    frame.groupby("Desk").apply(lambda group: weighted_avg(group, "Value0", "Weight"), include_groups=False)
+
+
+def _run_highlight_style(frame):
+    styles = synthetic.highlight_styles()
+    frame["Value0"].map(lambda value: get_highlight_style(value, "pnl", styles))
+    frame["Value1"].abs().map(lambda value: get_highlight_style(value, "var", styles))
+
+
+FRAME_SIZES = {"small": {"rows": 10_000}, "medium": {"rows": 100_000}, "large": {"rows": 1_000_000}}
+
+
+# --- OutlookManager / MailDispatch -------------------------------------------------------------------------------
+
+def _setup_mailbox(params, workdir, rng):
+    outlook = synthetic.FakeOutlook(rng, "Oil Brokerage Curves", params["messages"], params["attachment_rows"])
+    return OutlookManager(False, outlook=outlook)
+
+
+def _run_read_latest_attachment(manager):
+    manager.read_latest_attachment_as_dataframe("Inbox", "Oil Brokerage Curves", file_type="csv", header_row=0)
+
+
+def _run_read_attachment_by_subject(manager):
+    manager.read_attachment_by_subject("Inbox", "Oil Brokerage Curves", "Curves", file_type="csv", header_row=0)
+
+
+MAILBOX_SIZES = {
+    "small": {"messages": 100, "attachment_rows": 200},
+    "medium": {"messages": 2_000, "attachment_rows": 2_000},
+    "large": {"messages": 20_000, "attachment_rows": 10_000},
+}
+
+
+def _setup_bulk_send(params, workdir, rng):
+    outbox_dir = os.path.join(workdir, "outbox")
+    shutil.rmtree(outbox_dir, ignore_errors=True)
+    manager = OutlookManager(False, outlook=LocalOutbox(outbox_dir))
+    recipients = synthetic.recipients_frame(rng, params["messages"])
+    recipients["Report"] = [{f"{desk}.csv": synthetic.risk_frame(rng, params["attachment_rows"], 4)}
+                            for desk in recipients["Desk"]]
+    summary = synthetic.risk_frame(rng, params["attachment_rows"], 4)
+    return manager, recipients, summary
+
+
+def _run_bulk_send(state):
+    manager, recipients, summary = state
+    report = manager.send_bulk_emails(recipients, "Risk report for {Desk}", "<p>PnL for {Desk}: {PnL:,.0f}</p>",
+                                      html=True, attachments={"summary.xlsx": summary}, attachment_column="Report")
+    if (report["Status"] != "Sent").any():
+        raise RuntimeError("Bulk send reported failures")
+
+
+BULK_SEND_SIZES = {
+    "small": {"messages": 20, "attachment_rows": 100},
+    "medium": {"messages": 200, "attachment_rows": 500},
+    "large": {"messages": 1_000, "attachment_rows": 2_000},
+}
+
+
+# --- ExcelMacroRunner / ExcelInstancePool / JobScheduler ---------------------------------------------------------
+
+class _BenchmarkExcel(synthetic.FakeExcel):
+    launch_seconds = 0.05
+
+
+def _setup_macro_workbooks(params, workdir, rng):
+    paths = [synthetic.touch(os.path.join(workdir, f"pack_{i}.xlsm")) for i in range(params["workbooks"])]
+    macros = [(f"Macro{i}", [i]) for i in range(params["macros"])]
+    return paths, macros
+
+
+def _run_macro_per_call(state):
+    paths, macros = state
+    for path in paths:
+        runner = ExcelMacroRunner(path, enable_logging=False, application_factory=_BenchmarkExcel)
+        for macro_name, _ in macros:
+            if not runner.run_macro(macro_name):
+                raise RuntimeError(f"Macro {macro_name} failed")
+
+
+def _run_macro_pool(state):
+    paths, macros = state
+    with ExcelInstancePool(False, size=2, application_factory=_BenchmarkExcel) as pool:
+        futures = [pool.submit(path, macros) for path in paths]
+        if not all(future.result()["Success"] for future in futures):
+            raise RuntimeError("Pooled macro session failed")
+
+
+MACRO_SIZES = {
+    "small": {"workbooks": 2, "macros": 3},
+    "medium": {"workbooks": 6, "macros": 15},
+    "large": {"workbooks": 12, "macros": 30},
+}
+
+
+def _setup_scheduler(params, workdir, rng):
+    return params
+
+
+def _noop():
+    return None
+
+
+def _run_scheduler(params):
+    # A fan-out/fan-in graph: a root, ``width`` parallel chains of ``depth`` steps, and a final join
+    scheduler = JobScheduler(False, {"io": 8})
+    scheduler.add_job("root", _noop)
+    for chain in range(params["width"]):
+        previous = "root"
+        for step in range(params["depth"]):
+            previous = scheduler.add_job(f"chain{chain}_{step}", _noop, depends_on=[previous])
+    scheduler.add_job("join", _noop, depends_on=[f"chain{chain}_{params['depth'] - 1}"
+                                                 for chain in range(params["width"])])
+    report = scheduler.run()
+    if (report["Status"] != "Succeeded").any():
+        raise RuntimeError("Scheduler benchmark had failed steps")
+
+
+SCHEDULER_SIZES = {
+    "small": {"width": 5, "depth": 5},
+    "medium": {"width": 20, "depth": 20},
+    "large": {"width": 50, "depth": 40},
+}
+
+
+CASES = [
+    Case("dates.init_and_lookups", {"small": {"years": 5, "holidays": 12}, "medium": {"years": 30, "holidays": 20},
+                                    "large": {"years": 100, "holidays": 40}},
+         _setup_dates, _run_dates, lambda p: p["years"] * p["holidays"] * len(synthetic.REGIONS), "holiday rows"),
+    Case("excel.write_data", WORKBOOK_SIZES, _setup_workbook, _run_write_data, _workbook_cells, "cells"),
+    Case("excel.write_data_wide", WIDE_WORKBOOK_SIZES, _setup_workbook, _run_write_data, _workbook_cells, "cells"),
+    Case("excel.read_excel", WORKBOOK_SIZES, _setup_workbook, _run_read_excel,
+         lambda p: p["rows"] * (p["cols"] + 2), "cells"),
+    Case("excel.read_sheets", WORKBOOK_SIZES, _setup_workbook, _run_read_sheets, _workbook_cells, "cells"),
+    Case("excel.amend_records", WORKBOOK_SIZES, _setup_workbook, _run_amend_records,
+         lambda p: p["rows"] * (p["cols"] + 2), "cells"),
+    Case("excel.write_with_formatting", WORKBOOK_SIZES, _setup_workbook, _run_write_with_formatting,
+         _workbook_cells, "cells", requires=("xlsxwriter",)),
+    Case("misc.read_named_range_to_df", {"small": {"rows": 1_000, "cols": 10}, "medium": {"rows": 5_000, "cols": 20},
+                                         "large": {"rows": 50_000, "cols": 30}},
+         _setup_named_range, _run_named_range, lambda p: p["rows"] * p["cols"], "cells"),
+    Case("misc.weighted_avg", FRAME_SIZES, _setup_frame, _run_weighted_avg, lambda p: p["rows"], "rows"),
+    Case("misc.get_highlight_style", FRAME_SIZES, _setup_frame, _run_highlight_style,
+         lambda p: 2 * p["rows"], "cells"),
+    Case("outlook.read_latest_attachment", MAILBOX_SIZES, _setup_mailbox, _run_read_latest_attachment,
+         lambda p: p["attachment_rows"], "rows"),
+    Case("outlook.read_attachment_by_subject", MAILBOX_SIZES, _setup_mailbox, _run_read_attachment_by_subject,
+         lambda p: p["messages"], "messages"),
+    Case("outlook.send_bulk_emails", BULK_SEND_SIZES, _setup_bulk_send, _run_bulk_send,
+         lambda p: p["messages"], "messages"),
+    Case("macro.run_macro_per_call", MACRO_SIZES, _setup_macro_workbooks, _run_macro_per_call,
+         lambda p: p["workbooks"] * p["macros"], "macros"),
+    Case("macro.instance_pool", MACRO_SIZES, _setup_macro_workbooks, _run_macro_pool,
+         lambda p: p["workbooks"] * p["macros"], "macros"),
+    Case("scheduler.fan_out_fan_in", SCHEDULER_SIZES, _setup_scheduler, _run_scheduler,
+         lambda p: p["width"] * p["depth"] + 2, "steps"),
+]
+
+
+def run_case(case, size, repeat, seed, workdir):
+    """
+    Time ``case`` at ``size``: best of at least ``repeat`` runs, repeated up to MAX_REPEAT times until the timed
+    runs add up to MIN_TIMED_SECONDS, plus one traced run for peak memory. The garbage collector is paused while
+    timing, as in timeit.
+    """
+    params = case.sizes[size]
+
+    def fresh_state():
+        # Fresh inputs for every run, so cases which modify their inputs (amend_records) stay comparable
+        return case.setup(params, workdir, np.random.default_rng(seed))
+
+    timings = []
+    while len(timings) < repeat or (sum(timings) < MIN_TIMED_SECONDS and len(timings) < MAX_REPEAT):
+        state = fresh_state()
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            case.run(state)
+            timings.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+
+    state = fresh_state()
+    tracemalloc.start()
+    try:
+        case.run(state)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = min(timings)
+    items = case.items(params)
+    return {
+        "name": case.name,
+        "size": size,
+        "params": params,
+        "seconds": best,
+        "median_seconds": float(np.median(timings)),
+        "repeats": len(timings),
+        "peak_mb": peak / 2 ** 20,
+        "items": items,
+        "unit": case.unit,
+        "throughput": items / best if best > 0 else None,
+    }
+
+
+def _is_regression(old, new, threshold, min_delta):
+    return new - old > min_delta and new > old * (1 + threshold)
+
+
+def compare(results, baseline, seed, threshold, min_delta, memory_threshold, min_memory_delta):
+    """
+    Return a DataFrame comparing ``results`` with ``baseline`` on best time and peak memory. A metric regresses when
+    it grows by more than both the relative threshold and the absolute minimum delta.
+
+    Cases are only compared when both runs used the same seed and the case ran with the same parameters. Other cases,
+    and cases present on one side only, are listed with Comparable False and the reason in Note.
+    """
+    baseline_seed = baseline.get("meta", {}).get("seed")
+    previous = {(r["name"], r["size"]): r for r in baseline["results"]}
+    current = {(r["name"], r["size"]) for r in results}
+    rows = []
+    for result in results:
+        old = previous.get((result["name"], result["size"]))
+        row = {"Case": result["name"], "Size": result["size"], "Seconds": result["seconds"],
+               "PeakMB": result["peak_mb"], "Comparable": False, "Regression": False}
+        if old is None:
+            row["Note"] = "not in baseline"
+        elif baseline_seed != seed:
+            row["Note"] = f"baseline seed {baseline_seed} != {seed}"
+        elif old["params"] != json.loads(json.dumps(result["params"])):  # compare as stored in JSON
+            row["Note"] = f"params differ (baseline {old['params']})"
+        else:
+            time_regression = _is_regression(old["seconds"], result["seconds"], threshold, min_delta)
+            memory_regression = _is_regression(old["peak_mb"], result["peak_mb"], memory_threshold,
+                                               min_memory_delta)
+            row.update({
+                "BaselineSeconds": old["seconds"],
+                "TimeRatio": result["seconds"] / old["seconds"] if old["seconds"] > 0 else float("inf"),
+                "BaselineMB": old["peak_mb"],
+                "MemoryRatio": result["peak_mb"] / old["peak_mb"] if old["peak_mb"] > 0 else float("inf"),
+                "Comparable": True,
+                "Regression": time_regression or memory_regression,
+                "Note": "",
+            })
+        rows.append(row)
+    for (name, size), old in previous.items():
+        if (name, size) not in current:
+            rows.append({"Case": name, "Size": size, "BaselineSeconds": old["seconds"], "BaselineMB": old["peak_mb"],
+                         "Comparable": False, "Regression": False, "Note": "not in this run"})
+    return pd.DataFrame(rows, columns=["Case", "Size", "BaselineSeconds", "Seconds", "TimeRatio", "BaselineMB",
+                                       "PeakMB", "MemoryRatio", "Comparable", "Regression", "Note"])
+
+
+def _positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", choices=SIZES, default=["small", "medium"])
+    parser.add_argument("--filter", default=None, help="Only run cases whose name contains this text.")
+    parser.add_argument("--repeat", type=_positive_int, default=3,
+                        help=f"Minimum timed repeats per case and size (best is kept); fast cases are repeated "
+                             f"until {MIN_TIMED_SECONDS}s of timed runs, up to {MAX_REPEAT} times.")
+    parser.add_argument("--seed", type=int, default=20260101)
+    parser.add_argument("--output", default=None, help="Results JSON path (default: benchmarks/results/<time>.json).")
+    parser.add_argument("--baseline", default=None, help="Baseline JSON to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.50,
+                        help="Allowed relative slowdown versus the baseline before a case counts as a regression.")
+    parser.add_argument("--min-delta", type=float, default=0.01,
+                        help="Slowdowns smaller than this many seconds never count as regressions.")
+    parser.add_argument("--memory-threshold", type=float, default=0.25,
+                        help="Allowed relative growth in peak memory versus the baseline.")
+    parser.add_argument("--min-memory-delta", type=float, default=1.0,
+                        help="Peak memory growth smaller than this many MB never counts as a regression.")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Also write results to {DEFAULT_BASELINE}.")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.ERROR)  # the modules under test log failures at ERROR; keep the output readable
+
+    cases = [case for case in CASES if args.filter is None or args.filter in case.name]
+    results, skipped = [], []
+    workdir = tempfile.mkdtemp(prefix="operations_bench_")
+    try:
+        for case in cases:
+            missing = [module for module in case.requires if importlib.util.find_spec(module) is None]
+            if missing:
+                skipped.append({"name": case.name, "reason": f"missing {', '.join(missing)}"})
+                print(f"{case.name:40s} skipped (missing {', '.join(missing)})")
+                continue
+            for size in args.sizes:
+                result = run_case(case, size, args.repeat, args.seed, workdir)
+                results.append(result)
+                print(f"{case.name:40s} {size:7s} {result['seconds']:9.4f}s  {result['peak_mb']:9.1f} MB  "
+                      f"{result['throughput']:14,.0f} {result['unit']}/s")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    document = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+        "skipped": skipped,
+    }
+
+    output = args.output
+    if output is None:
+        os.makedirs(DEFAULT_RESULTS_DIR, exist_ok=True)
+        output = os.path.join(DEFAULT_RESULTS_DIR, datetime.now().strftime("%Y%m%d_%H%M%S") + ".json")
+    with open(output, "w") as f:
+        json.dump(document, f, indent=2)
+    print(f"Results written to {output}")
+    if args.save_baseline:
+        with open(DEFAULT_BASELINE, "w") as f:
+            json.dump(document, f, indent=2)
+        print(f"Baseline written to {DEFAULT_BASELINE}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            comparison = compare(results, json.load(f), args.seed, args.threshold, args.min_delta,
+                                 args.memory_threshold, args.min_memory_delta)
+        comparable = comparison["Comparable"]
+        with pd.option_context("display.width", 200, "display.max_rows", None, "display.max_colwidth", 80):
+            if comparable.any():
+                print(comparison[comparable].drop(columns=["Comparable", "Note"]).to_string(index=False))
+            if not comparable.all():
+                print(f"{int((~comparable).sum())} case(s) not compared:")
+                print(comparison.loc[~comparable, ["Case", "Size", "Note"]].to_string(index=False))
+        if comparison["Regression"].any():
+            print(f"{int(comparison['Regression'].sum())} regression(s): time above {args.threshold:.0%} and "
+                  f"{args.min_delta}s, or peak memory above {args.memory_threshold:.0%} and {args.min_memory_delta} MB")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""
+Synthetic inputs and COM stand-ins for the Operations benchmarks.
+
+Every generator takes a numpy Generator so a given seed always produces the same data.
+"""
+import os
+import time
+import threading
+from datetime import datetime, timedelta
+from io import BytesIO
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.workbook.defined_name import DefinedName
+
+REGIONS = ["UK", "US", "EU", "SG", "JP", "AU"]
+DESKS = ["Oil", "Gas", "LNG", "Power", "Coal", "Freight", "Emissions", "Metals"]
+
+
+def holiday_calendar_csv(path, rng, years, regions=REGIONS, holidays_per_year=12, keep_clear=()):
+    """
+    Write a multi-region holiday calendar in the layout DateOperations reads: Region, Date (dd/mm/YYYY).
+
+    :param keep_clear: Dates which are never made holidays, so a benchmark can use them as the current date.
+    """
+    keep_clear = set(keep_clear)
+    start_year = 2026 - years + 1
+    rows = []
+    for region in regions:
+        for year in range(start_year, 2027):
+            days = rng.choice(365, size=holidays_per_year, replace=False)
+            for day in sorted(days):
+                date = datetime(year, 1, 1) + timedelta(days=int(day))
+                if date not in keep_clear:
+                    rows.append((region, date.strftime("%d/%m/%Y")))
+    pd.DataFrame(rows, columns=["Region", "Date"]).to_csv(path, index=False)
+    return path
+
+
+def risk_frame(rng, rows, cols):
+    """A position/risk style frame: an Id column, a Desk column and ``cols`` numeric columns."""
+    data = {"Id": np.arange(rows) % max(rows // 10, 1), "Desk": rng.choice(DESKS, size=rows)}
+    for i in range(cols):
+        data[f"Value{i}"] = rng.normal(0, 1_000_000, size=rows).round(2)
+    return pd.DataFrame(data)
+
+
+def multi_sheet_workbook(path, rng, sheets, rows, cols):
+    """Write a workbook of ``sheets`` risk frames and return the {sheet name: DataFrame} written."""
+    frames = {f"Sheet{i}": risk_frame(rng, rows, cols) for i in range(sheets)}
+    with pd.ExcelWriter(path, engine="openpyxl", mode="w") as writer:
+        for sheetname, frame in frames.items():
+            frame.to_excel(writer, sheet_name=sheetname, index=False)
+    return frames
+
+
+def named_range_workbook(path, rng, rows, cols, range_name="RiskData"):
+    """Write a workbook with a named range covering a header row plus ``rows`` data rows."""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Data"
+    ws.append([f"Col{i}" for i in range(cols)])
+    values = rng.normal(0, 1000, size=(rows, cols)).round(2)
+    for row in values:
+        ws.append(row.tolist())
+    last_col = ws.cell(row=1, column=cols).column_letter
+    wb.defined_names[range_name] = DefinedName(range_name, attr_text=f"Data!$A$1:${last_col}${rows + 1}")
+    wb.save(path)
+    return range_name
+
+
+def highlight_styles():
+    """Banded styles in the shape get_highlight_style expects: {style_type: [(lower, upper, colour), ...]}."""
+    return {
+        "pnl": [(-np.inf, -1_000_000, "#FF0000"), (-1_000_000, 0, "#FFC7CE"), (0, 1_000_000, "#C6EFCE"),
+                (1_000_000, np.inf, "#00B050")],
+        "var": [(0, 500_000, "#C6EFCE"), (500_000, 2_000_000, "#FFEB9C"), (2_000_000, np.inf, "#FF0000")],
+    }
+
+
+def recipients_frame(rng, count):
+    """One row per personalised report email."""
+    return pd.DataFrame({
+        "To": [f"trader{i}@example.com" for i in range(count)],
+        "Desk": rng.choice(DESKS, size=count),
+        "PnL": rng.normal(0, 1_000_000, size=count).round(0),
+    })
+
+
+# --- Outlook stand-ins -------------------------------------------------------------------------------------------
+
+class FakePropertyAccessor:
+    def __init__(self, data):
+        self._data = data
+
+    def GetProperty(self, schema):
+        return self._data
+
+
+class FakeAttachment:
+    def __init__(self, filename, data):
+        self.FileName = filename
+        self.PropertyAccessor = FakePropertyAccessor(data)
+
+
+class FakeAttachments(list):
+    @property
+    def Count(self):
+        return len(self)
+
+
+class FakeMessage:
+    Class = 43  # olMail
+
+    def __init__(self, subject, received, attachments):
+        self.Subject = subject
+        self.SenderName = "Broker"
+        self.ReceivedTime = received
+        self.Attachments = FakeAttachments(attachments)
+
+
+class FakeItems(list):
+    def Sort(self, key, descending=False):
+        super().sort(key=lambda m: m.ReceivedTime, reverse=descending)
+
+
+class FakeFolder:
+    def __init__(self, name, items=(), folders=()):
+        self.Name = name
+        self.Items = FakeItems(items)
+        self.Folders = FakeFolders(folders)
+
+
+class FakeFolders(list):
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            for folder in self:
+                if folder.Name == key:
+                    return folder
+            raise KeyError(key)
+        return super().__getitem__(key)
+
+    def Item(self, index):
+        return self[index - 1]  # COM collections are 1-based
+
+
+class FakeNamespace:
+    def __init__(self, account):
+        self.Folders = FakeFolders([account])
+
+    def GetDefaultFolder(self, folder_type):
+        return self.Folders.Item(1).Folders["Inbox"]
+
+
+class FakeOutlook:
+    """
+    Stand-in for Outlook.Application holding one account with Inbox/<subfolder> filled with ``messages`` emails,
+    each carrying a CSV attachment. Only the oldest message's subject contains ``subject_keyword``, so subject
+    searches scan the whole folder.
+    """
+
+    def __init__(self, rng, subfolder, messages, attachment_rows, subject_keyword="Curves"):
+        csv = BytesIO()
+        risk_frame(rng, attachment_rows, 6).to_csv(csv, index=False)
+        data = csv.getvalue()
+        base = datetime(2026, 1, 1)
+        items = []
+        for i in range(messages):
+            subject = f"{subject_keyword} {i}" if i == 0 else f"Daily update {i}"
+            attachments = [FakeAttachment("notes.txt", b"n/a"), FakeAttachment(f"report_{i}.csv", data)]
+            items.append(FakeMessage(subject, base + timedelta(minutes=i), attachments))
+        inbox = FakeFolder("Inbox", folders=[FakeFolder(subfolder, items)])
+        self._namespace = FakeNamespace(FakeFolder("account", folders=[inbox]))
+
+    def GetNamespace(self, name):
+        return self._namespace
+
+
+# --- Excel stand-ins ---------------------------------------------------------------------------------------------
+
+class FakeWorkbook:
+    def __init__(self, open_seconds):
+        time.sleep(open_seconds)
+
+    def Save(self):
+        pass
+
+    def Close(self, save_changes=False):
+        pass
+
+
+class FakeExcel:
+    """
+    Stand-in for Excel.Application. Launch, workbook open and macro run costs are simulated with sleeps so
+    scheduling overhead (launch per macro versus a warm pool) shows up in the timings.
+    """
+
+    launch_seconds = 0.2
+    open_seconds = 0.02
+    macro_seconds = 0.005
+
+    def __init__(self):
+        time.sleep(self.launch_seconds)
+        self.Visible = False
+        self.DisplayAlerts = True
+        self.Workbooks = self
+        self.Application = self
+        self._killed = threading.Event()
+
+    def Open(self, filepath):
+        return FakeWorkbook(self.open_seconds)
+
+    def Run(self, macro_name, *args):
+        if self._killed.wait(self.macro_seconds):
+            raise RuntimeError("Excel process terminated")
+        return len(args)
+
+    def Kill(self):
+        self._killed.set()
+
+    def Quit(self):
+        pass
+
+
+def touch(path):
+    """Create an empty placeholder file (ExcelMacroRunner checks its workbook exists)."""
+    with open(path, "wb"):
+        pass
+    return os.path.abspath(path)